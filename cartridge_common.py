@@ -0,0 +1,319 @@
+# System switching shared by the cartridge sensor scripts
+import io
+import time
+import subprocess
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+import os
+import mmap
+from process_utils import find_pids, kill_pids
+from file_utils import file_signature
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+# Config files rewritten on each trigger
+ES_SYSTEMS_PATH = "/opt/retropie/configs/all/emulationstation/es_systems.cfg"
+ES_SETTINGS_PATH = os.path.join(os.path.expanduser('~pi'), '.emulationstation', 'es_settings.cfg')
+THEME_PATH = "/etc/emulationstation/themes/es-theme-ssimple-ve/theme.xml"
+ROMS_PATH = "/home/pi/RetroPie/roms"
+
+# Watch the config directories (so the watch survives a file being replaced)
+# and only go back to disk for a file once the kernel reports it was written.
+# A file that can't be watched is checked against its last seen signature instead.
+_config_watches = {}
+_config_dirty = {"systems": True, "theme": True}
+_config_signatures = {"systems": None, "theme": None}
+
+def watch_config_files():
+    if INotify is None:
+        print("inotify_simple not installed, checking config files with stat instead")
+        return None
+    try:
+        inotify = INotify()
+    except OSError as e:
+        print(f"Error setting up inotify: {e}")
+        return None
+    for key, path in (("systems", ES_SYSTEMS_PATH), ("theme", THEME_PATH)):
+        try:
+            wd = inotify.add_watch(os.path.dirname(path), flags.CLOSE_WRITE | flags.MOVED_TO)
+        except OSError as e:
+            print(f"Error watching {path}: {e}")
+            continue
+        _config_watches[(wd, os.path.basename(path))] = key
+    return inotify
+
+_inotify = watch_config_files()
+_watched_keys = set(_config_watches.values())
+
+# Parsed es_systems.cfg, reused until the file is written by someone else
+_systems_cache = {"tree": None}
+
+# Location of the StartupSystem line in es_settings.cfg, found on first use
+STARTUP_SYSTEM_KEY = b'<string name="StartupSystem"'
+_startup_line = {"offset": None}
+
+# Overlay name theme.xml is known to already be using
+_theme_overlay = {"current": None}
+
+def launch_emulationstation():
+    # Popen returns straight away; systemd takes care of the restart from here
+    subprocess.Popen(['sudo', 'systemctl', 'restart', 'getty@tty1'],
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def write_file_atomically(path, data):
+    # Write a temp file and rename it over the original, so a power cut leaves either
+    # the old or the new file and never a truncated one. We run as root, so copy the
+    # original's owner and mode across to keep it writable by EmulationStation.
+    # Returns the signature of the file as written.
+    tmp_path = path + '.tmp'
+    st = os.stat(path)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        signature = file_signature(os.fstat(f.fileno()))
+    os.chown(tmp_path, st.st_uid, st.st_gid)
+    os.chmod(tmp_path, st.st_mode)
+    os.replace(tmp_path, path)
+    return signature
+
+def poll_config_changes():
+    # Mark any watched config file that has been written since the last check
+    if _inotify is None:
+        return
+    for event in _inotify.read(timeout=0):
+        if event.mask & flags.Q_OVERFLOW:
+            # Events were dropped, so any of the files may have changed
+            for key in _config_dirty:
+                _config_dirty[key] = True
+            continue
+        key = _config_watches.get((event.wd, event.name))
+        if key is not None:
+            _config_dirty[key] = True
+
+def config_changed(key, path):
+    # True if the file may differ from the version we last read or wrote
+    poll_config_changes()
+    if key in _watched_keys:
+        return _config_dirty[key]
+    # Not watched, so compare the file itself against the version we saw
+    try:
+        return file_signature(os.stat(path)) != _config_signatures[key]
+    except OSError:
+        return True
+
+def mark_config_clean(key, path, signature):
+    # Swallow the events from our own read or write so it isn't mistaken for an
+    # external edit. Those events can't be told apart from someone else writing the
+    # file in the meantime, so it only counts as clean if it is still the version we saw.
+    poll_config_changes()
+    _config_signatures[key] = signature
+    if key not in _watched_keys:
+        return
+    try:
+        _config_dirty[key] = file_signature(os.stat(path)) != signature
+    except OSError:
+        _config_dirty[key] = True
+
+def move_gb_to_top_of_systems():
+    xml_path = ES_SYSTEMS_PATH
+    
+    # Reuse the parsed tree if the file hasn't changed since the last trigger
+    if config_changed("systems", xml_path) or _systems_cache["tree"] is None:
+        with open(xml_path, 'rb') as f:
+            signature = file_signature(os.fstat(f.fileno()))
+            _systems_cache["tree"] = ET.parse(f)
+        mark_config_clean("systems", xml_path, signature)
+    tree = _systems_cache["tree"]
+    root = tree.getroot()
+    
+    # Nothing to do if GB is already the first system
+    first_system = root.find('system')
+    if first_system is not None and first_system.find('name').text == 'gb':
+        return
+    
+    # Find the GB system
+    systems = root.findall('system')
+    gb_system = None
+    for system in systems:
+        if system.find('name').text == 'gb':
+            gb_system = system
+            break
+    
+    if gb_system is not None:
+        # Remove GB system and insert at the beginning
+        root.remove(gb_system)
+        root.insert(0, gb_system)
+        
+        # Save the modified XML
+        buffer = io.BytesIO()
+        tree.write(buffer)
+        signature = write_file_atomically(xml_path, buffer.getvalue())
+        mark_config_clean("systems", xml_path, signature)
+
+def find_startup_line(file):
+    # Scan es_settings.cfg for the StartupSystem line, returning (offset, line)
+    file.seek(0)
+    offset = 0
+    for line in iter(file.readline, b''):
+        if STARTUP_SYSTEM_KEY in line:
+            return offset, line
+        offset += len(line)
+    return None, b''
+
+def update_startup_system(new_system):
+    es_settings_path = ES_SETTINGS_PATH
+    
+    new_line = f'<string name="StartupSystem" value="{new_system}" />'.encode()
+    
+    try:
+        rewritten = None
+        with open(es_settings_path, 'rb+') as file:
+            # EmulationStation rewrites this file, so check the remembered location
+            # still holds the setting and only scan the whole file if it doesn't
+            offset = _startup_line["offset"]
+            line = b''
+            if offset is not None:
+                file.seek(offset)
+                line = file.readline()
+            if not line.lstrip().startswith(STARTUP_SYSTEM_KEY):
+                offset, line = find_startup_line(file)
+            if offset is None:
+                return
+            length = len(line.rstrip(b'\r\n'))
+            
+            if len(new_line) <= length:
+                # Overwrite the record in place, padding out any leftover bytes
+                file.seek(offset)
+                file.write(new_line.ljust(length))
+            else:
+                # Doesn't fit, so the whole file has to be rewritten
+                file.seek(0)
+                content = file.read()
+                rewritten = content[:offset] + new_line + content[offset + length:]
+            
+            _startup_line["offset"] = offset
+        
+        if rewritten is not None:
+            write_file_atomically(es_settings_path, rewritten)
+        
+        print(f"Updated startup system to: {new_system}")
+        
+    except Exception as e:
+        print(f"Error updating startup system: {e}")
+
+def play_video_overlay(system):
+    video_file = "gameboy_boot_overlay.mp4" if system == 'gb' else "nes_loading_overlay.mp4"
+    video_path = f"/home/pi/{video_file}"
+    
+    # Pass the argument list straight to su rather than going through /bin/sh first
+    cmd = f'omxplayer --layer 10000 --aspect-mode stretch --adev alsa {video_path}'
+    subprocess.Popen(['su', '-', 'pi', '-c', cmd])
+    time.sleep(0.5)
+
+def list_rom_folders(roms_path):
+    # One directory listing instead of a stat per folder we care about
+    with os.scandir(roms_path) as entries:
+        return {entry.name for entry in entries if entry.is_dir()}
+
+def determine_next_system(folders=None):
+    if folders is None:
+        folders = list_rom_folders(ROMS_PATH)
+    
+    if 'gb' in folders and 'nes_disabled' in folders:
+        return 'nes'
+    return 'gb'
+
+def update_theme_overlay(new_system):
+    theme_file = THEME_PATH
+    old_overlay = "nes_overlay.png" if new_system == 'gb' else "gb_overlay.png"
+    new_overlay = "gb_overlay.png" if new_system == 'gb' else "nes_overlay.png"
+    
+    try:
+        # Skip the file entirely if it's unedited since we last saw this overlay
+        if not config_changed("theme", theme_file) and _theme_overlay["current"] == new_overlay:
+            return
+        
+        # Search the mapped file in place and only copy it out if it needs rewriting
+        with open(theme_file, 'rb') as f:
+            signature = file_signature(os.fstat(f.fileno()))
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm.find(old_overlay.encode()) == -1:
+                    content = None
+                else:
+                    content = mm[:]
+        
+        if content is not None:
+            updated_content = content.replace(old_overlay.encode(), new_overlay.encode())
+            
+            signature = write_file_atomically(theme_file, updated_content)
+            print(f"Updated theme overlay to: {new_overlay}")
+        
+        mark_config_clean("theme", theme_file, signature)
+        _theme_overlay["current"] = new_overlay
+                
+    except Exception as e:
+        print(f"Error updating theme overlay: {e}")
+
+def toggle_system_folders(folders=None):
+    # Takes the folder listing already made for this trigger, if there is one
+    roms_path = ROMS_PATH
+    
+    gb_path = os.path.join(roms_path, "gb")
+    gb_disabled_path = os.path.join(roms_path, "gb_disabled")
+    nes_path = os.path.join(roms_path, "nes")
+    nes_disabled_path = os.path.join(roms_path, "nes_disabled")
+    
+    if folders is None:
+        folders = list_rom_folders(roms_path)
+    
+    # Each switch is two renames. If it's interrupted between them, both folders
+    # end up disabled, which the last case below recovers from on the next trigger.
+    if 'gb' in folders and 'nes_disabled' in folders:
+        os.rename(gb_path, gb_disabled_path)
+        os.rename(nes_disabled_path, nes_path)
+        update_startup_system('nes')
+        update_theme_overlay('nes')
+        print("Switched: Disabled GB and enabled NES")
+        return 'nes'
+    
+    elif 'nes' in folders and 'gb_disabled' in folders:
+        os.rename(nes_path, nes_disabled_path)
+        os.rename(gb_disabled_path, gb_path)
+        update_startup_system('gb')
+        update_theme_overlay('gb')
+        print("Switched: Enabled GB and disabled NES")
+        return 'gb'
+    
+    elif 'gb' in folders and 'nes' in folders:
+        os.rename(nes_path, nes_disabled_path)
+        update_startup_system('gb')
+        update_theme_overlay('gb')
+        print("Both were enabled: Disabled NES, kept GB enabled")
+        return 'gb'
+    elif 'gb_disabled' in folders and 'nes_disabled' in folders:
+        os.rename(gb_disabled_path, gb_path)
+        update_startup_system('gb')
+        update_theme_overlay('gb')
+        print("Both were disabled: Enabled GB")
+        return 'gb'
+
+def handle_trigger():
+    # Switch systems once a sensor script has decided the cartridge was blown
+    # List the roms folder once and use it for both deciding and switching
+    folders = list_rom_folders(ROMS_PATH)
+    next_system = determine_next_system(folders)
+    play_video_overlay(next_system)
+    
+    kill_pids(find_pids('retroarch'))
+    kill_pids(find_pids('emulationstation'))
+    toggle_system_folders(folders)
+    move_gb_to_top_of_systems()
+    
+    print("Attempting to restart EmulationStation...")
+    launch_emulationstation()
+    print("EmulationStation restart command sent")
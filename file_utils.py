@@ -0,0 +1,4 @@
+# File helpers shared by the cartridge and accelerometer scripts
+def file_signature(st):
+    # Identifies one version of a file: replacing it changes the inode, writing it the mtime
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
@@ -0,0 +1,26 @@
+# Process lookup shared by the cartridge and accelerometer scripts
+import os
+import signal
+
+def find_pids(name):
+    # Scan /proc for processes with this name (truncated to 15 chars like the kernel does)
+    comm = name[:15]
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/comm') as f:
+                    if f.read().rstrip('\n') == comm:
+                        pids.append(int(entry))
+            except OSError:
+                # Process exited while we were scanning
+                pass
+    return pids
+
+def kill_pids(pids):
+    # Same as killall, without forking a helper to do it
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
@@ -7,8 +7,21 @@ import os
 import re
 import configparser
 from pathlib import Path
+from process_utils import find_pids, kill_pids
+from file_utils import file_signature
+
+# Tilt (in g) needed to enter a rotation, and to fall back out of it
+ROTATE_ENTER_THRESHOLD = 0.55
+ROTATE_EXIT_THRESHOLD = 0.45
+# Consecutive samples that must agree before a new rotation is applied
+ROTATION_CONFIRM_SAMPLES = 3
 
 class RetroArchAccelerometerMonitor:
+    # Launch command line written to runcommand.log
+    EXECUTING_RE = re.compile(rb'Executing: (.+)$', re.MULTILINE)
+    # Only this much of the end of runcommand.log is searched first
+    LOG_TAIL_BYTES = 8192
+
     def __init__(self):
         # Initialize I2C and accelerometer
         self.i2c = board.I2C()
@@ -18,6 +31,14 @@ class RetroArchAccelerometerMonitor:
         self.config_path = "/opt/retropie/configs/all/retroarch.cfg"
         self.runcommand_log = "/dev/shm/runcommand.log"
         self.current_rotation = "0"
+        self._pending_rotation = None
+        self._pending_count = 0
+        
+        # Parsed retroarch.cfg and its line layout, reused while the file is unchanged
+        self._config_cache = {}
+        self._config_lines = []
+        self._config_index = {}
+        self._config_signature = None
         
         # Default settings
         self.default_settings = {
@@ -36,68 +57,70 @@ class RetroArchAccelerometerMonitor:
         except Exception as e:
             print(f"Error managing touch-keyboard service: {e}")
 
-    def is_retroarch_running(self):
-        """Check if RetroArch is currently running."""
-        try:
-            result = subprocess.run(['pgrep', 'retroarch'], capture_output=True, text=True)
-            return result.returncode == 0
-        except Exception as e:
-            print(f"Error checking RetroArch process: {e}")
-            return False
+    def load_config(self):
+        """Parse the RetroArch configuration if it changed since the last read."""
+        if file_signature(os.stat(self.config_path)) == self._config_signature:
+            return
         
-    def is_emulationstation_running(self):
-        """Check if EmulationStation is currently running."""
-        try:
-            # Use ps to find EmulationStation processes
-            result = subprocess.run(
-                ['ps', 'aux'], 
-                capture_output=True, 
-                text=True
-            )
-            return 'emulationstatio' in result.stdout
-        except Exception as e:
-            print(f"Error checking EmulationStation process: {e}")
-            return False
+        with open(self.config_path, 'r') as f:
+            signature = file_signature(os.fstat(f.fileno()))
+            lines = f.readlines()
+        
+        config = {}
+        line_index = {}
+        for i, line in enumerate(lines):
+            if '=' in line:
+                key, value = line.strip().split('=', 1)
+                config[key.strip()] = value.strip()
+                line_index.setdefault(key.strip(), []).append(i)
+        
+        self._config_cache = config
+        self._config_lines = lines
+        self._config_index = line_index
+        self._config_signature = signature
 
     def read_config(self):
         """Read the current RetroArch configuration."""
-        config = {}
         try:
-            with open(self.config_path, 'r') as f:
-                for line in f:
-                    if '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        config[key.strip()] = value.strip()
+            self.load_config()
+            return dict(self._config_cache)
         except Exception as e:
             print(f"Error reading config: {e}")
-        return config
+        return {}
 
     def write_config(self, config):
         """Write the updated configuration to file."""
         try:
-            with open(self.config_path, 'r') as f:
-                lines = f.readlines()
+            self.load_config()
             
-            # Update existing lines
-            for i, line in enumerate(lines):
-                if '=' in line:
-                    key = line.split('=')[0].strip()
-                    if key in config:
-                        lines[i] = f"{key} = {config[key]}\n"
+            # Update existing lines using the layout from the last read
+            for key, value in config.items():
+                for i in self._config_index.get(key, ()):
+                    self._config_lines[i] = f"{key} = {value}\n"
+                    self._config_cache[key] = str(value).strip()
             
             with open(self.config_path, 'w') as f:
-                f.writelines(lines)
+                f.writelines(self._config_lines)
+                f.flush()
+                # Taken from our own handle so a write by someone else straight
+                # afterwards can't be mistaken for this one
+                self._config_signature = file_signature(os.fstat(f.fileno()))
         except Exception as e:
             print(f"Error writing config: {e}")
 
     def get_retroarch_command(self):
         """Extract the RetroArch command from runcommand.log."""
         try:
-            with open(self.runcommand_log, 'r') as f:
-                content = f.read()
-                match = re.search(r'Executing: (.+)$', content, re.MULTILINE)
-                if match:
-                    return match.group(1)
+            with open(self.runcommand_log, 'rb') as f:
+                # Look at the tail of the log first, falling back to the whole file
+                size = f.seek(0, os.SEEK_END)
+                f.seek(max(0, size - self.LOG_TAIL_BYTES))
+                matches = self.EXECUTING_RE.findall(f.read())
+                if not matches and size > self.LOG_TAIL_BYTES:
+                    f.seek(0)
+                    matches = self.EXECUTING_RE.findall(f.read())
+                if matches:
+                    return matches[-1].decode()
         except Exception as e:
             print(f"Error reading runcommand.log: {e}")
         return None
@@ -106,10 +129,11 @@ class RetroArchAccelerometerMonitor:
         """Handle RetroArch restart sequence."""
         try:
             # 1. Kill RetroArch if it's running
-            retroarch_was_running = self.is_retroarch_running()
+            retroarch_pids = find_pids('retroarch')
+            retroarch_was_running = bool(retroarch_pids)
             if retroarch_was_running:
                 print("Killing RetroArch")
-                subprocess.run(['killall', 'retroarch'], check=False)
+                kill_pids(retroarch_pids)
             
             # 2. Configuration changes are handled by the caller (update_rotation method)
             
@@ -122,9 +146,10 @@ class RetroArchAccelerometerMonitor:
                 if command:
                     
                     # 5. Kill EmulationStation only if we've relaunched RetroArch
-                    if self.is_emulationstation_running():
+                    emulationstation_pids = find_pids('emulationstation')
+                    if emulationstation_pids:
                         print("Killing EmulationStation")
-                        subprocess.run(['killall', 'emulationstation'], check=False)
+                        kill_pids(emulationstation_pids)
                         time.sleep(1)
 
                     print(f"Command: {command}")
@@ -147,14 +172,39 @@ class RetroArchAccelerometerMonitor:
         self.manage_touch_keyboard(True)  # Ensure touch keyboard is running at startup
         print("Reset to default settings")
 
+    def rotation_for(self, x_acceleration):
+        """Map X-axis acceleration to a rotation, with hysteresis around the current one."""
+        # Stay rotated until the tilt drops back inside the exit band
+        if self.current_rotation == "1" and x_acceleration >= ROTATE_EXIT_THRESHOLD:
+            return "1"
+        if self.current_rotation == "3" and x_acceleration <= -ROTATE_EXIT_THRESHOLD:
+            return "3"
+        if x_acceleration >= ROTATE_ENTER_THRESHOLD:
+            return "1"
+        if x_acceleration <= -ROTATE_ENTER_THRESHOLD:
+            return "3"
+        return "0"
+
     def update_rotation(self, x_acceleration):
         """Update configuration based on X-axis acceleration."""
-        current_config = self.read_config()
-        new_rotation = "1" if x_acceleration >= 0.5 else "3" if x_acceleration <= -0.5 else "0"
+        new_rotation = self.rotation_for(x_acceleration)
+        
+        # Require a few matching samples in a row so a jostle doesn't restart RetroArch
+        if new_rotation == self.current_rotation:
+            self._pending_rotation = None
+            self._pending_count = 0
+            return
+        if new_rotation != self._pending_rotation:
+            self._pending_rotation = new_rotation
+            self._pending_count = 0
+        self._pending_count += 1
         
-        # Only update if rotation has changed
-        if new_rotation != self.current_rotation:
+        # Only update once the new rotation has held
+        if self._pending_count >= ROTATION_CONFIRM_SAMPLES:
+            self._pending_rotation = None
+            self._pending_count = 0
             self.current_rotation = new_rotation
+            current_config = self.read_config()
             
             # Update configuration
             updates = {
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
+import os
 import time
-import asyncio
+import queue
+import threading
 import board
 import busio
 import adafruit_drv2605
+from smbus2 import SMBus
 from evdev import InputDevice, UInput, categorize, ecodes
 
 # Touch regions with physical coordinates
@@ -24,6 +27,21 @@ TOUCH_REGIONS = [
 
 VIEWPORT_REGION = {'name': 'VIEWPORT', 'key': ecodes.KEY_ENTER, 'coords': (0, 0, 480, 388)}
 
+# Per-slot values collected from EV_ABS events within a frame
+FRAME_FIELDS = {
+    ecodes.ABS_MT_TRACKING_ID: 'tracking_id',
+    ecodes.ABS_MT_POSITION_X: 'x',
+    ecodes.ABS_MT_POSITION_Y: 'y',
+    ecodes.ABS_MT_TOUCH_MAJOR: 'touch_size',
+}
+
+# Event codes used on every event, bound once instead of looked up on ecodes each time
+EV_KEY = ecodes.EV_KEY
+EV_ABS = ecodes.EV_ABS
+EV_SYN = ecodes.EV_SYN
+ABS_MT_SLOT = ecodes.ABS_MT_SLOT
+SYN_REPORT = ecodes.SYN_REPORT
+
 # Screen dimensions and scaling
 PHYSICAL_WIDTH = 480
 PHYSICAL_HEIGHT = 800
@@ -32,12 +50,63 @@ TOUCH_MAX_Y = 479
 X_SCALE = (TOUCH_MAX_X + 1) / PHYSICAL_WIDTH
 Y_SCALE = (TOUCH_MAX_Y + 1) / PHYSICAL_HEIGHT
 
+# RIGHT+B combination box (138x505 to 339x607) as touch coordinates (x1, x2, y1, y2)
+RIGHT_B_BOX = (int(138 * X_SCALE), int(339 * X_SCALE), int(505 * Y_SCALE), int(607 * Y_SCALE))
+
 # Adjusted gesture detection parameters
 SWIPE_MIN_DISTANCE = 60  # Reduced from 100
 SWIPE_MIN_VERTICAL = 50  # Reduced from 80
 SWIPE_MAX_OFF_AXIS = 70  # Increased from 50
 SWIPE_COOLDOWN = 0.3     # Reduced from 0.5
 VIEWPORT_TAP_TIMEOUT = 0.15  # Maximum time to wait before triggering viewport button
+SWIPE_HOLD_MS = 16       # How long swipe and tap key presses are held before release
+
+# DRV2605 haptic driver: writing 1 to the GO register plays the loaded sequence
+HAPTIC_I2C_BUS = 1
+DRV2605_ADDR = 0x5A
+DRV2605_GO = 0x0C
+
+# Multitouch slots tracked (touch controllers rarely report more than 10)
+MAX_SLOTS = 16
+
+# Print every key event (off by default to keep stdout writes off the input path)
+DEBUG = False
+
+# Real-time priority for the touch reading thread
+READER_PRIORITY = 10
+
+def key_tuple(key):
+    # Region keys are a single code or a list of codes; always store a tuple
+    return tuple(key) if isinstance(key, list) else (key,)
+
+# Keys the virtual keyboard can emit, taken from the region table so the two
+# can't drift apart, plus the swipe arrows and ESC
+UINPUT_KEYS = {key for region in TOUCH_REGIONS + [VIEWPORT_REGION] for key in key_tuple(region['key'])}
+UINPUT_KEYS |= {ecodes.KEY_ESC, ecodes.KEY_UP, ecodes.KEY_DOWN, ecodes.KEY_LEFT, ecodes.KEY_RIGHT}
+UINPUT_EVENTS = {EV_KEY: sorted(UINPUT_KEYS)}
+
+class TouchSlot:
+    """State for one multitouch slot, reused from one touch to the next."""
+    __slots__ = ('tracking_id', 'x', 'y', 'start_x', 'start_y', 'touch_size',
+                 'touch_start_time', 'last_swipe_time', 'button_pressed',
+                 'in_viewport', 'swipe_detected', 'active_buttons')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, tracking_id=-1, now=0):
+        self.tracking_id = tracking_id
+        self.x = None
+        self.y = None
+        self.start_x = None
+        self.start_y = None
+        self.touch_size = 0
+        self.touch_start_time = now
+        self.last_swipe_time = 0
+        self.button_pressed = False
+        self.in_viewport = False
+        self.swipe_detected = False
+        self.active_buttons = 0
 
 class TouchKeyboardMapper:
     def __init__(self, touch_device_path):
@@ -48,8 +117,16 @@ class TouchKeyboardMapper:
         i2c = busio.I2C(board.SCL, board.SDA)
         self.drv = adafruit_drv2605.DRV2605(i2c)
         self.drv.sequence[0] = adafruit_drv2605.Effect(1)
+        # Playback only needs the GO register set, so write it directly
+        # instead of going through the driver object
+        self.haptic_bus = SMBus(HAPTIC_I2C_BUS)
         print("Haptic controller initialized")
 
+        # Haptic playback is an I2C transaction, so it runs on its own thread
+        # rather than holding up key events
+        self.haptic_requests = queue.SimpleQueue()
+        threading.Thread(target=self.haptic_worker, daemon=True).start()
+
         # Track which buttons are currently active
         self.active_buttons = set()
         self.TOUCH_SIZE_THRESHOLD = 40
@@ -66,17 +143,38 @@ class TouchKeyboardMapper:
             )
             self.touch_regions.append({
                 'name': region['name'],
-                'key': region['key'],
-                'coords': touch_coords
+                'key': key_tuple(region['key']),
+                'coords': touch_coords,
+                'bit': 1 << len(self.touch_regions)
             })
             print(f"Region {region['name']}: Physical ({x1},{y1})-({x2},{y2}) -> "
                   f"Touch {touch_coords}")
+        self.regions_by_name = {region['name']: region for region in self.touch_regions}
+
+        # Active buttons are tracked as a bitmask of region bits
+        self.directional_mask = 0
+        for name in ('UP', 'DOWN', 'LEFT', 'RIGHT'):
+            self.directional_mask |= self.regions_by_name[name]['bit']
+        # Button combinations a large touch can press together
+        self.a_b_mask = self.regions_by_name['A BTN']['bit'] | self.regions_by_name['B BTN']['bit']
+        self.right_b_mask = self.regions_by_name['RIGHT']['bit'] | self.regions_by_name['B BTN']['bit']
+
+        # Per-axis lookup tables: bit i is set in x_region_masks[x] if region i spans
+        # column x, and likewise for rows, so the regions under a point are x & y
+        self.x_region_masks = [0] * (TOUCH_MAX_X + 1)
+        self.y_region_masks = [0] * (TOUCH_MAX_Y + 1)
+        for i, region in enumerate(self.touch_regions):
+            x1, y1, x2, y2 = region['coords']
+            for x in range(max(x1, 0), min(x2, TOUCH_MAX_X) + 1):
+                self.x_region_masks[x] |= 1 << i
+            for y in range(max(y1, 0), min(y2, TOUCH_MAX_Y) + 1):
+                self.y_region_masks[y] |= 1 << i
 
         # Convert viewport region
         x1, y1, x2, y2 = VIEWPORT_REGION['coords']
         self.viewport = {
             'name': VIEWPORT_REGION['name'],
-            'key': VIEWPORT_REGION['key'],
+            'key': key_tuple(VIEWPORT_REGION['key']),
             'coords': (
                 int(x1 * X_SCALE),
                 int(y1 * Y_SCALE),
@@ -88,284 +186,270 @@ class TouchKeyboardMapper:
               f"Touch {self.viewport['coords']}")
 
         # Create virtual keyboard
-        events = {
-            ecodes.EV_KEY: [
-                ecodes.KEY_ESC, ecodes.KEY_ENTER, ecodes.KEY_A, ecodes.KEY_B,
-                ecodes.KEY_LEFTCTRL, ecodes.KEY_RIGHT, ecodes.KEY_UP,
-                ecodes.KEY_LEFT, ecodes.KEY_DOWN, ecodes.KEY_E, ecodes.KEY_L, ecodes.KEY_S
-            ]
-        }
-        self.virtual_keyboard = UInput(events, name="Virtual-Touch-Keyboard")
+        self.virtual_keyboard = UInput(UINPUT_EVENTS, name="Virtual-Touch-Keyboard")
         
         # Improved multitouch handling
-        self.touch_slots = {}
+        self.touch_slots = [TouchSlot() for _ in range(MAX_SLOTS)]
         self.current_slot = 0
+        self._dirty = False  # Keys written since the last syn()
+        self.pending = {}  # Slot changes in the current frame, keyed by slot id
         self.active_gestures = set()
 
     def check_touch_regions(self, x, y, touch_size=0):
-        # Returns list of regions that should be active based on position and touch size
-        active_regions = []
+        # Returns the bitmask of regions that should be active based on position and touch size
         
-        # Check if we're in the RIGHT+B combo box (138x505 to 339x607)
-        in_right_b_box = (138 * X_SCALE <= x <= 339 * X_SCALE and 
-                         505 * Y_SCALE <= y <= 607 * Y_SCALE)
+        # First check regular button regions, using the lookup tables to find
+        # the ones the touch is directly in
+        mask = 0
+        if 0 <= x <= TOUCH_MAX_X and 0 <= y <= TOUCH_MAX_Y:
+            mask = self.x_region_masks[x] & self.y_region_masks[y]
         
-        # First check regular button regions
-        for region in self.touch_regions:
-            x1, y1, x2, y2 = region['coords']
-            # If touch is directly in region
-            if x1 <= x <= x2 and y1 <= y <= y2:
-                active_regions.append(region)
-                
-                # If touch is large enough and we're in either A or B button,
-                # check if we should activate both A+B
-                if (touch_size >= self.TOUCH_SIZE_THRESHOLD and 
-                    region['name'] in ['A BTN', 'B BTN']):
-                    # Find and add the other button
-                    other_button = 'B BTN' if region['name'] == 'A BTN' else 'A BTN'
-                    for other_region in self.touch_regions:
-                        if other_region['name'] == other_button:
-                            active_regions.append(other_region)
-                            break
-        
-        # Handle RIGHT+B combination box
-        if in_right_b_box and touch_size >= self.TOUCH_SIZE_THRESHOLD:
-            # Ensure both RIGHT and B are in active regions
-            found_b = False
-            found_right = False
-            for region in active_regions:
-                if region['name'] == 'B BTN':
-                    found_b = True
-                elif region['name'] == 'RIGHT':
-                    found_right = True
+        if touch_size >= self.TOUCH_SIZE_THRESHOLD:
+            # If touch is large enough and we're in either A or B button,
+            # activate both A+B
+            if mask & self.a_b_mask:
+                mask |= self.a_b_mask
             
-            if not found_b:
-                for region in self.touch_regions:
-                    if region['name'] == 'B BTN':
-                        active_regions.append(region)
-                        break
-            
-            if not found_right:
-                for region in self.touch_regions:
-                    if region['name'] == 'RIGHT':
-                        active_regions.append(region)
-                        break
+            # Handle RIGHT+B combination box
+            x1, x2, y1, y2 = RIGHT_B_BOX
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                mask |= self.right_b_mask
         
-        return active_regions
+        return mask
+
+    def regions_in(self, mask):
+        # Yields the regions whose bits are set in mask, lowest bit first
+        while mask:
+            low_bit = mask & -mask
+            mask ^= low_bit
+            yield self.touch_regions[low_bit.bit_length() - 1]
 
     def is_in_viewport(self, x, y):
         x1, y1, x2, y2 = self.viewport['coords']
         return x1 <= x <= x2 and y1 <= y <= y2
 
-    async def trigger_haptic(self):
-        try:
-            self.drv.play()
-        except Exception as e:
-            print(f"Haptic error: {e}")
+    def haptic_worker(self):
+        while True:
+            self.haptic_requests.get()
+            try:
+                self.haptic_bus.write_byte_data(DRV2605_ADDR, DRV2605_GO, 0x01)
+            except Exception as e:
+                print(f"Haptic error: {e}")
+
+    def trigger_haptic(self):
+        self.haptic_requests.put_nowait(None)
 
-    async def emit_key(self, key_code, value, region_name):
+    def log_key(self, key_code, value, region_name):
         timestamp = time.strftime("%H:%M:%S")
         event_type = "Press" if value == 1 else "Release"
-        
-        if isinstance(key_code, list):
-            for key in key_code:
-                self.virtual_keyboard.write(ecodes.EV_KEY, key, value)
-                print(f"[{timestamp}] Key {event_type}: {region_name} (code: {key})")
-        else:
-            self.virtual_keyboard.write(ecodes.EV_KEY, key_code, value)
-            print(f"[{timestamp}] Key {event_type}: {region_name} (code: {key_code})")
+        print(f"[{timestamp}] Key {event_type}: {region_name} (code: {key_code})")
+
+    def emit_key(self, key_codes, value, region_name):
+        for key in key_codes:
+            self.virtual_keyboard.write(EV_KEY, key, value)
+            if DEBUG:
+                self.log_key(key, value, region_name)
         
         if value == 1:
-            await self.trigger_haptic()
+            self.trigger_haptic()
         
-        self.virtual_keyboard.syn()
+        self._dirty = True
+
+    def flush_keys(self):
+        # One syn() per frame covers every key written since the last one
+        if self._dirty:
+            self.virtual_keyboard.syn()
+            self._dirty = False
 
-    def can_trigger_swipe(self, slot_id):
-        slot = self.touch_slots.get(slot_id, {})
+    def tap_key(self, key_codes, region_name):
+        # Press and release in separate reports with a short hold between them,
+        # since emulators can miss a key that is released in the same instant
+        self.emit_key(key_codes, 1, region_name)
+        self.flush_keys()
+        time.sleep(SWIPE_HOLD_MS / 1000)
+        self.emit_key(key_codes, 0, region_name)
+
+    def can_trigger_swipe(self, slot_id, now):
+        slot = self.touch_slots[slot_id]
         return (
             slot_id not in self.active_gestures and
-            not slot.get('button_pressed', False) and
-            time.time() - slot.get('last_swipe_time', 0) > SWIPE_COOLDOWN
+            not slot.button_pressed and
+            now - slot.last_swipe_time > SWIPE_COOLDOWN
         )
 
-    async def process_tracking_id(self, event):
-        slot = self.touch_slots.get(self.current_slot, {})
-        if event.value == -1:  # Touch ended
+    def process_tracking_id(self, slot_id, tracking_id, now):
+        slot = self.touch_slots[slot_id]
+        if tracking_id == -1:  # Touch ended
             # Release any active buttons
-            for button in slot.get('active_buttons', set()):
-                for region in self.touch_regions:
-                    if region['name'] == button:
-                        await self.emit_key(region['key'], 0, region['name'])
+            self.release_all_active(slot)
 
-            if self.current_slot in self.active_gestures:
-                self.active_gestures.remove(self.current_slot)
+            if slot_id in self.active_gestures:
+                self.active_gestures.remove(slot_id)
             
             # Check for viewport tap
-            if (slot.get('in_viewport', False) and 
-                not slot.get('swipe_detected', False) and 
-                not slot.get('button_pressed', False) and
-                time.time() - slot.get('touch_start_time', 0) < VIEWPORT_TAP_TIMEOUT):
-                await self.emit_key(self.viewport['key'], 1, "VIEWPORT")
-                await self.emit_key(self.viewport['key'], 0, "VIEWPORT")
+            if (slot.in_viewport and 
+                not slot.swipe_detected and 
+                not slot.button_pressed and
+                now - slot.touch_start_time < VIEWPORT_TAP_TIMEOUT):
+                self.tap_key(self.viewport['key'], "VIEWPORT")
             
-            self.touch_slots[self.current_slot] = {}
+            slot.reset()
         else:  # New touch started
-            self.touch_slots[self.current_slot] = {
-                'tracking_id': event.value,
-                'start_x': None,
-                'start_y': None,
-                'last_swipe_time': 0,
-                'button_pressed': False,
-                'touch_start_time': time.time(),
-                'swipe_detected': False,
-                'in_viewport': False,
-                'active_buttons': set(),
-                'touch_size': 0
-            }
-
-    async def update_active_buttons(self, slot, new_regions):
+            slot.reset(tracking_id, now)
+
+    def release_all_active(self, slot):
+        # Nothing to do on the common path where no buttons are held
+        if not slot.active_buttons:
+            return
+        for region in self.regions_in(slot.active_buttons):
+            self.emit_key(region['key'], 0, region['name'])
+        slot.active_buttons = 0
+
+    def update_active_buttons(self, slot, new_mask):
         """
         Updates the active buttons for a slot, with different behavior for directional keys
         """
-        current_buttons = set()
-        directional_keys = {'UP', 'DOWN', 'LEFT', 'RIGHT'}
-        
-        # First, handle directional keys - more sensitive to release
-        old_directionals = {btn for btn in slot.get('active_buttons', set()) 
-                          if btn in directional_keys}
-        new_directionals = {region['name'] for region in new_regions 
-                          if region['name'] in directional_keys}
-        
-        # Release any directional keys not directly in their regions
-        for old_dir in old_directionals - new_directionals:
-            for region in self.touch_regions:
-                if region['name'] == old_dir:
-                    await self.emit_key(region['key'], 0, region['name'])
+        old_mask = slot.active_buttons
         
-        # Handle non-directional buttons with more forgiving state management
-        new_regular_regions = [region for region in new_regions 
-                             if region['name'] not in directional_keys]
+        # First, release any directional keys not directly in their regions
+        for region in self.regions_in(old_mask & self.directional_mask & ~new_mask):
+            self.emit_key(region['key'], 0, region['name'])
         
-        # Add all new regions to current buttons set
-        for region in new_regions:
-            current_buttons.add(region['name'])
-            if region['name'] not in slot.get('active_buttons', set()):
-                # Only emit key press for newly active buttons
-                await self.emit_key(region['key'], 1, region['name'])
+        # Only emit key press for newly active buttons
+        for region in self.regions_in(new_mask & ~old_mask):
+            self.emit_key(region['key'], 1, region['name'])
         
-        # Only release non-directional buttons that are no longer in any active region
-        old_non_directionals = {btn for btn in slot.get('active_buttons', set()) 
-                              if btn not in directional_keys}
-        for old_button in old_non_directionals - current_buttons:
-            for region in self.touch_regions:
-                if region['name'] == old_button:
-                    await self.emit_key(region['key'], 0, region['name'])
+        # Then release non-directional buttons that are no longer in any active region
+        for region in self.regions_in(old_mask & ~self.directional_mask & ~new_mask):
+            self.emit_key(region['key'], 0, region['name'])
         
-        return current_buttons
+        return new_mask
 
-    async def process_touch_position(self, event):
-        slot = self.touch_slots.get(self.current_slot, {})
+    def process_touch_position(self, slot_id, deltas, now):
+        slot = self.touch_slots[slot_id]
         
-        if event.code == ecodes.ABS_MT_POSITION_X:
-            slot['x'] = event.value
-            if slot.get('start_x') is None:
-                slot['start_x'] = event.value
-        elif event.code == ecodes.ABS_MT_POSITION_Y:
-            slot['y'] = event.value
-            if slot.get('start_y') is None:
-                slot['start_y'] = event.value
-        elif event.code == ecodes.ABS_MT_TOUCH_MAJOR:
-            slot['touch_size'] = event.value
-        
-        self.touch_slots[self.current_slot] = slot
-
-        if 'x' in slot and 'y' in slot:
-            touch_size = slot.get('touch_size', 0)
+        if 'x' in deltas:
+            slot.x = deltas['x']
+            if slot.start_x is None:
+                slot.start_x = deltas['x']
+        if 'y' in deltas:
+            slot.y = deltas['y']
+            if slot.start_y is None:
+                slot.start_y = deltas['y']
+        if 'touch_size' in deltas:
+            slot.touch_size = deltas['touch_size']
 
+        if slot.x is not None and slot.y is not None:
             # First check regular button regions
-            regions = self.check_touch_regions(slot['x'], slot['y'], touch_size)
+            region_mask = self.check_touch_regions(slot.x, slot.y, slot.touch_size)
             
             # Handle button regions (non-viewport)
-            if regions:
+            if region_mask:
                 # Update active buttons without unnecessary press/release cycles
-                slot['active_buttons'] = await self.update_active_buttons(slot, regions)
-                slot['button_pressed'] = True
-                self.touch_slots[self.current_slot] = slot
+                slot.active_buttons = self.update_active_buttons(slot, region_mask)
+                slot.button_pressed = True
                 
             # Handle viewport region and gestures
-            elif self.is_in_viewport(slot['x'], slot['y']):
-                slot['in_viewport'] = True
+            elif self.is_in_viewport(slot.x, slot.y):
+                slot.in_viewport = True
 
                 # Release any previously active buttons
-                if slot.get('active_buttons'):
-                    for old_button in slot['active_buttons']:
-                        for region in self.touch_regions:
-                            if region['name'] == old_button:
-                                await self.emit_key(region['key'], 0, region['name'])
-                    slot['active_buttons'] = set()
-
-                if self.can_trigger_swipe(self.current_slot):
-                    dx = slot['x'] - slot['start_x']
-                    dy = slot['y'] - slot['start_y']
+                self.release_all_active(slot)
+
+                if self.can_trigger_swipe(slot_id, now):
+                    dx = slot.x - slot.start_x
+                    dy = slot.y - slot.start_y
                     
                     # Check for horizontal swipe
                     if abs(dx) > SWIPE_MIN_DISTANCE and abs(dy) < SWIPE_MAX_OFF_AXIS:
-                        key = ecodes.KEY_RIGHT if dx > 0 else ecodes.KEY_LEFT
-                        await self.emit_key(key, 1, f"Swipe {'right' if dx > 0 else 'left'}")
-                        await self.emit_key(key, 0, f"Swipe {'right' if dx > 0 else 'left'}")
-                        slot['last_swipe_time'] = time.time()
-                        slot['start_x'] = slot['x']
-                        slot['start_y'] = slot['y']
-                        slot['swipe_detected'] = True
+                        key = (ecodes.KEY_RIGHT,) if dx > 0 else (ecodes.KEY_LEFT,)
+                        self.tap_key(key, f"Swipe {'right' if dx > 0 else 'left'}")
+                        slot.last_swipe_time = now
+                        slot.start_x = slot.x
+                        slot.start_y = slot.y
+                        slot.swipe_detected = True
                     
                     # Check for vertical swipe
                     elif abs(dy) > SWIPE_MIN_VERTICAL and abs(dx) < SWIPE_MAX_OFF_AXIS:
-                        key = ecodes.KEY_DOWN if dy > 0 else ecodes.KEY_UP
-                        await self.emit_key(key, 1, f"Swipe {'down' if dy > 0 else 'up'}")
-                        await self.emit_key(key, 0, f"Swipe {'down' if dy > 0 else 'up'}")
-                        slot['last_swipe_time'] = time.time()
-                        slot['start_x'] = slot['x']
-                        slot['start_y'] = slot['y']
-                        slot['swipe_detected'] = True
-                
-                self.touch_slots[self.current_slot] = slot
+                        key = (ecodes.KEY_DOWN,) if dy > 0 else (ecodes.KEY_UP,)
+                        self.tap_key(key, f"Swipe {'down' if dy > 0 else 'up'}")
+                        slot.last_swipe_time = now
+                        slot.start_x = slot.x
+                        slot.start_y = slot.y
+                        slot.swipe_detected = True
             
             # If we're not in any region, release any active buttons
             else:
-                if slot.get('active_buttons'):
-                    for old_button in slot['active_buttons']:
-                        for region in self.touch_regions:
-                            if region['name'] == old_button:
-                                await self.emit_key(region['key'], 0, region['name'])
-                    slot['active_buttons'] = set()
-                    slot['button_pressed'] = False
-                    self.touch_slots[self.current_slot] = slot
-
-    async def run(self):
+                if slot.active_buttons:
+                    self.release_all_active(slot)
+                    slot.button_pressed = False
+
+    def run(self):
         print("\nMonitoring touches... (Press Ctrl+C to exit)\n")
         
-        async for event in self.touch_device.async_read_loop():
-            if event.type == ecodes.EV_ABS:
-                if event.code == ecodes.ABS_MT_SLOT:
-                    self.current_slot = event.value
-                elif event.code == ecodes.ABS_MT_TRACKING_ID:
-                    await self.process_tracking_id(event)
-                elif event.code in (ecodes.ABS_MT_POSITION_X, ecodes.ABS_MT_POSITION_Y):
-                    await self.process_touch_position(event)
+        # Blocking reads straight off the device; each event is handled as it arrives
+        for event in self.touch_device.read_loop():
+            self.dispatch(event)
+
+    def dispatch(self, event):
+        # Collect each slot's changes until SYN_REPORT closes the frame, so the
+        # regions are only resolved once per frame with both coordinates updated
+        if event.type == EV_ABS:
+            if event.code == ABS_MT_SLOT:
+                self.current_slot = event.value
+            elif event.code in FRAME_FIELDS and self.current_slot < MAX_SLOTS:
+                self.pending.setdefault(self.current_slot, {})[FRAME_FIELDS[event.code]] = event.value
+        elif event.type == EV_SYN and event.code == SYN_REPORT:
+            # One clock read per frame, shared by every slot in it
+            now = time.monotonic()
+            for slot_id, deltas in self.pending.items():
+                self.flush_slot(slot_id, deltas, now)
+            self.pending.clear()
+            self.flush_keys()
+
+    def flush_slot(self, slot_id, deltas, now):
+        # A new or ended touch is handled before any movement in the same frame
+        if 'tracking_id' in deltas:
+            self.process_tracking_id(slot_id, deltas['tracking_id'], now)
+            if deltas['tracking_id'] == -1:
+                return
+        if deltas.keys() - {'tracking_id'}:
+            self.process_touch_position(slot_id, deltas, now)
 
     def cleanup(self):
         self.virtual_keyboard.close()
         self.touch_device.close()
+        self.haptic_bus.close()
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Touch to Keyboard mapper with haptic feedback")
     parser.add_argument('device', help="Touch input device (e.g., /dev/input/event1)")
+    parser.add_argument('--debug', action='store_true', help="Print every key event")
     args = parser.parse_args()
+    DEBUG = args.debug
 
     mapper = TouchKeyboardMapper(args.device)
+
+    # Pin the reading thread to the last core and give it real-time priority so
+    # key events aren't delayed behind other processes. This only affects the
+    # calling thread, so the haptic worker keeps its normal scheduling.
+    # Without root, python3 needs CAP_SYS_NICE:
+    #   sudo setcap cap_sys_nice+ep $(readlink -f $(which python3))
+    # Priority is set first: pinning to one core at normal priority would be worse
+    # than leaving the scheduler free to move the thread, so only pin once it's raised.
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(READER_PRIORITY))
+    except OSError as e:
+        print(f"Running with normal scheduling: {e}")
+    else:
+        try:
+            os.sched_setaffinity(0, {max(os.sched_getaffinity(0))})
+        except OSError as e:
+            print(f"Running with real-time priority but not pinned to a core: {e}")
+
     try:
-        asyncio.run(mapper.run())
+        mapper.run()
     except KeyboardInterrupt:
         print("\nExiting...")
     finally:
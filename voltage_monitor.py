@@ -18,6 +18,12 @@ chan = AnalogIn(ads, ADS.P3)
 # Define the voltage threshold for shutdown (in volts)
 VOLTAGE_THRESHOLD = 3.0  # Adjust this value based on your needs
 
+# Poll slowly while the battery is well above the threshold, faster as it gets close
+VOLTAGE_MARGIN = 0.5       # Volts above the threshold that count as "close"
+SLOW_POLL_INTERVAL = 10    # Seconds between readings when well above the threshold
+FAST_POLL_INTERVAL = 2     # Seconds between readings when close to the threshold
+CONFIRM_DELAY = 0.5        # Seconds before re-checking a reading below the threshold
+
 def check_voltage():
     try:
         while True:
@@ -29,14 +35,18 @@ def check_voltage():
             if voltage < VOLTAGE_THRESHOLD:
                 print("Voltage below threshold, initiating shutdown...")
                 # Wait a moment to ensure it's not a momentary drop
-                time.sleep(1)
+                time.sleep(CONFIRM_DELAY)
                 
                 # Check voltage again to confirm
                 if chan.voltage < VOLTAGE_THRESHOLD:
                     os.system("sudo shutdown -h now")
             
             # Wait before next reading
-            time.sleep(1)
+            if voltage > VOLTAGE_THRESHOLD + VOLTAGE_MARGIN:
+                interval = SLOW_POLL_INTERVAL
+            else:
+                interval = FAST_POLL_INTERVAL
+            time.sleep(interval)
             
     except KeyboardInterrupt:
         print("Monitoring stopped by user")